@@ -0,0 +1,32 @@
+"""One-shot migration: convert ISO string created_at/updated_at to native BSON dates.
+
+Usage: python migrate_dates.py
+"""
+import asyncio
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+from pymongo import AsyncMongoClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+DATE_FIELDS = ("created_at", "updated_at")
+
+async def migrate():
+    client = AsyncMongoClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        for field in DATE_FIELDS:
+            # Server-side conversion; documents already holding dates are untouched
+            result = await db.products.update_many(
+                {field: {"$type": "string"}},
+                [{"$set": {field: {"$toDate": f"${field}"}}}]
+            )
+            print(f"products.{field}: converted {result.modified_count} documents")
+    finally:
+        await client.close()
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -1,45 +1,86 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Body, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient, ReturnDocument
+from pymongo.errors import BulkWriteError
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Annotated, Dict, List, Optional
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from passlib.context import CryptContext
+from cachetools import TTLCache
+import hashlib
+import threading
+import time
 import jwt
+import orjson
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# tz_aware so BSON dates come back as UTC-aware datetimes
+client = AsyncMongoClient(mongo_url, maxPoolSize=50, minPoolSize=10, tz_aware=True)
 db = client[os.environ['DB_NAME']]
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 security = HTTPBearer()
 
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
 if not SECRET_KEY:
     raise RuntimeError("JWT_SECRET_KEY is missing! Set it in the backend .env or hosting environment.")
 
+# Encoded once so PyJWT doesn't re-encode the secret on every sign/verify
+SECRET_KEY_BYTES = SECRET_KEY.encode()
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
+ACCESS_TOKEN_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+# Cache of verified tokens so repeat requests skip the HMAC check
+TOKEN_CACHE_TTL_SECONDS = 10
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
+
+# Cache of admin credentials so repeated logins don't hit Mongo each time.
+# Any future admin password change must pop the username from this cache.
+ADMIN_CACHE_TTL_SECONDS = 60
+_admin_cache = TTLCache(maxsize=128, ttl=ADMIN_CACHE_TTL_SECONDS)
+
+# Cache of serialized public product list pages, busted on every product write
+PRODUCTS_CACHE_TTL_SECONDS = 10
+_products_cache = TTLCache(maxsize=64, ttl=PRODUCTS_CACHE_TTL_SECONDS)
+# Bumped on every bust so reads that started before a write don't repopulate the cache
+_products_cache_generation = 0
+
+# Documents fetched per round trip when streaming product listings
+PRODUCT_BATCH_SIZE = 200
+MAX_PRODUCT_LIST_LIMIT = 1000
+MAX_BULK_PRODUCTS = 1000
+DUPLICATE_KEY_ERROR = 11000
+
+# Product lookups currently running, so concurrent requests for one id share a query
+_inflight_products: Dict[str, asyncio.Task] = {}
+
+# The customer list view only renders the first image and no variants
+PUBLIC_LIST_PROJECTION = {"_id": 0, "variants": 0, "images": {"$slice": 1}}
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # Models
 class Admin(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     username: str
     password_hash: str
 
@@ -59,7 +100,7 @@ class ProductVariant(BaseModel):
 
 class Product(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     name: str
     price: float
     description: str
@@ -89,41 +130,77 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def run_in_thread(func, *args):
+    """Run a blocking (CPU-bound) call off the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
 def create_access_token(data: dict) -> str:
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode = {**data, "exp": int(time.time()) + ACCESS_TOKEN_EXPIRE_SECONDS}
+    return jwt.encode(to_encode, SECRET_KEY_BYTES, algorithm=ALGORITHM)
+
+def decode_token(token: str) -> dict:
+    """Decode and verify a JWT, reusing the decoded payload of recently seen tokens"""
+    # Keyed on the whole token: a hit must mean this exact string was verified before
+    now = time.time()
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+    if cached is not None:
+        payload, expires_at = cached
+        if expires_at > now:
+            return payload
+
+    payload = jwt.decode(token, SECRET_KEY_BYTES, algorithms=[ALGORITHM])
+
+    # Never keep an entry past the token's own expiry
+    expires_at = min(now + TOKEN_CACHE_TTL_SECONDS, payload.get("exp", 0))
+    if expires_at > now:
+        with _token_cache_lock:
+            _token_cache[token] = (payload, expires_at)
+    return payload
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        return username
+        payload = decode_token(credentials.credentials)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-def prepare_for_mongo(data: dict) -> dict:
-    """Convert datetime objects to ISO strings for MongoDB storage"""
-    if isinstance(data.get('created_at'), datetime):
-        data['created_at'] = data['created_at'].isoformat()
-    if isinstance(data.get('updated_at'), datetime):
-        data['updated_at'] = data['updated_at'].isoformat()
-    return data
-
-def parse_from_mongo(item: dict) -> dict:
-    """Convert ISO strings back to datetime objects"""
-    if isinstance(item.get('created_at'), str):
-        item['created_at'] = datetime.fromisoformat(item['created_at'])
-    if isinstance(item.get('updated_at'), str):
-        item['updated_at'] = datetime.fromisoformat(item['updated_at'])
-    return item
+    username: str = payload.get("sub")
+    if username is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return username
+
+async def dump_products(projection: dict, offset: int = 0, limit: int = 0) -> bytes:
+    """Serialize products straight from Mongo to JSON bytes, bypassing pydantic"""
+    # Sorted on _id (creation order, always indexed) so offset pages are stable between requests
+    cursor = db.products.find({}, projection).sort("_id", 1).skip(offset).limit(limit).batch_size(PRODUCT_BATCH_SIZE)
+    return orjson.dumps([product async for product in cursor], option=orjson.OPT_UTC_Z)
+
+def _forget_inflight_product(product_id: str, task: asyncio.Task):
+    # Only remove our own entry; a write may already have replaced it with a newer lookup
+    if _inflight_products.get(product_id) is task:
+        del _inflight_products[product_id]
+
+def invalidate_products_cache():
+    global _products_cache_generation
+    _products_cache_generation += 1
+    _products_cache.clear()
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header (possibly a list) against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque_tag for tag in if_none_match.split(","))
+
+# Ensure lookup fields are indexed
+@app.on_event("startup")
+async def create_indexes():
+    await db.products.create_index("id", unique=True)
+    await db.admins.create_index("username", unique=True)
 
 # Initialize default admin (username: admin, password: admin123)
 @app.on_event("startup")
@@ -141,35 +218,69 @@ async def create_default_admin():
     if not existing_admin:
         admin = Admin(
             username=new_admin_username,
-            password_hash=hash_password(new_admin_password)
+            password_hash=await run_in_thread(hash_password, new_admin_password)
+        )
+        # Upsert so concurrent workers seeding an empty database don't collide on the unique index
+        result = await db.admins.update_one(
+            {"username": new_admin_username},
+            {"$setOnInsert": admin.model_dump()},
+            upsert=True
         )
-        await db.admins.insert_one(admin.model_dump())
-        logger.info(f"Default admin created: username='{new_admin_username}'")
+        if result.upserted_id is not None:
+            logger.info(f"Default admin created: username='{new_admin_username}'")
+        else:
+            logger.info(f"Admin user '{new_admin_username}' already exists; no creation performed.")
     else:
         logger.info(f"Admin user '{new_admin_username}' already exists; no creation performed.")
 
 
 # Public Routes (Customer View)
-@api_router.get("/products", response_model=List[Product])
-async def get_all_products():
-    """Get all products for customer view"""
-    products = await db.products.find({}, {"_id": 0}).to_list(1000)
-    return [parse_from_mongo(product) for product in products]
+@api_router.get("/products")
+async def get_all_products(
+    request: Request,
+    limit: int = Query(MAX_PRODUCT_LIST_LIMIT, ge=1, le=MAX_PRODUCT_LIST_LIMIT),
+    offset: int = Query(0, ge=0)
+):
+    """Get products for customer view"""
+    cache_key = (limit, offset)
+    cached = _products_cache.get(cache_key)
+    if cached is None:
+        generation = _products_cache_generation
+        body = await dump_products(PUBLIC_LIST_PROJECTION, offset, limit)
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        cached = (etag, body)
+        if generation == _products_cache_generation:
+            _products_cache[cache_key] = cached
+
+    etag, body = cached
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 @api_router.get("/products/{product_id}", response_model=Product)
 async def get_product(product_id: str):
     """Get single product detail"""
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
+    task = _inflight_products.get(product_id)
+    if task is None:
+        task = asyncio.ensure_future(db.products.find_one({"id": product_id}, {"_id": 0}))
+        _inflight_products[product_id] = task
+        task.add_done_callback(lambda done: _forget_inflight_product(product_id, done))
+    # Shielded so one disconnecting client doesn't cancel the query for the others
+    product = await asyncio.shield(task)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return parse_from_mongo(product)
+    return product
 
 # Admin Auth Routes
 @api_router.post("/admin/login", response_model=AdminLoginResponse)
 async def admin_login(login_data: AdminLogin):
     """Admin login endpoint"""
-    admin = await db.admins.find_one({"username": login_data.username})
-    if not admin or not verify_password(login_data.password, admin["password_hash"]):
+    admin = _admin_cache.get(login_data.username)
+    if admin is None:
+        admin = await db.admins.find_one({"username": login_data.username}, {"_id": 0, "username": 1, "password_hash": 1})
+        if admin:
+            _admin_cache[login_data.username] = admin
+    if not admin or not await run_in_thread(verify_password, login_data.password, admin["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -181,55 +292,95 @@ async def admin_login(login_data: AdminLogin):
         username=admin["username"]
     )
 
-@api_router.get("/admin/verify")
+# Protected Admin Routes (every route on this router requires a valid admin token)
+admin_router = APIRouter(prefix="/admin", dependencies=[Depends(verify_token)])
+
+@admin_router.get("/verify")
 async def verify_admin_token(username: str = Depends(verify_token)):
     """Verify if token is valid"""
     return {"username": username, "valid": True}
 
 # Admin Product Management Routes
-@api_router.get("/admin/products", response_model=List[Product])
-async def get_admin_products(username: str = Depends(verify_token)):
-    """Get all products for admin view"""
-    products = await db.products.find({}, {"_id": 0}).to_list(1000)
-    return [parse_from_mongo(product) for product in products]
-
-@api_router.post("/admin/products", response_model=Product)
-async def create_product(product_data: ProductCreate, username: str = Depends(verify_token)):
+@admin_router.get("/products")
+async def get_admin_products(
+    limit: int = Query(MAX_PRODUCT_LIST_LIMIT, ge=1, le=MAX_PRODUCT_LIST_LIMIT),
+    offset: int = Query(0, ge=0)
+):
+    """Get products for admin view"""
+    return Response(content=await dump_products({"_id": 0}, offset, limit), media_type="application/json")
+
+@admin_router.post("/products", response_model=Product)
+async def create_product(product_data: ProductCreate):
     """Create a new product"""
-    product = Product(**product_data.model_dump())
-    doc = prepare_for_mongo(product.model_dump())
+    # product_data is already validated, so skip re-validation
+    product = Product.model_construct(**dict(product_data))
+    doc = product.model_dump()
     await db.products.insert_one(doc)
+    invalidate_products_cache()
     return product
 
-@api_router.put("/admin/products/{product_id}", response_model=Product)
+@admin_router.post("/products/bulk")
+async def bulk_create_products(
+    products_data: Annotated[List[ProductCreate], Body(max_length=MAX_BULK_PRODUCTS)]
+):
+    """Create many products in a single write"""
+    if not products_data:
+        return {"inserted": 0}
+    docs = [Product.model_construct(**dict(product_data)).model_dump() for product_data in products_data]
+    try:
+        result = await db.products.insert_many(docs, ordered=False)
+    except BulkWriteError as exc:
+        # Unordered inserts keep going past failures, so part of the batch may be stored
+        invalidate_products_cache()
+        write_errors = exc.details["writeErrors"]
+        only_duplicates = all(error["code"] == DUPLICATE_KEY_ERROR for error in write_errors)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT if only_duplicates else status.HTTP_400_BAD_REQUEST,
+            detail={
+                "inserted": exc.details["nInserted"],
+                "errors": [
+                    {"index": error["index"], "code": error["code"], "message": error["errmsg"]}
+                    for error in write_errors
+                ]
+            }
+        )
+    invalidate_products_cache()
+    return {"inserted": len(result.inserted_ids)}
+
+@admin_router.put("/products/{product_id}", response_model=Product)
 async def update_product(
     product_id: str,
-    product_data: ProductUpdate,
-    username: str = Depends(verify_token)
+    product_data: ProductUpdate
 ):
     """Update an existing product"""
-    existing_product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if not existing_product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
     update_data = {k: v for k, v in product_data.model_dump().items() if v is not None}
     update_data["updated_at"] = datetime.now(timezone.utc)
     
-    update_doc = prepare_for_mongo(update_data)
-    await db.products.update_one({"id": product_id}, {"$set": update_doc})
-    
-    updated_product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    return parse_from_mongo(updated_product)
+    updated_product = await db.products.find_one_and_update(
+        {"id": product_id},
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    # Later readers must not join a lookup that started before this write
+    _inflight_products.pop(product_id, None)
+    invalidate_products_cache()
+    return updated_product
 
-@api_router.delete("/admin/products/{product_id}")
-async def delete_product(product_id: str, username: str = Depends(verify_token)):
+@admin_router.delete("/products/{product_id}")
+async def delete_product(product_id: str):
     """Delete a product"""
     result = await db.products.delete_one({"id": product_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    _inflight_products.pop(product_id, None)
+    invalidate_products_cache()
     return {"message": "Product deleted successfully"}
 
-# Include the router in the main app
+# Include the routers in the main app
+api_router.include_router(admin_router)
 app.include_router(api_router)
 
 app.add_middleware(
@@ -249,4 +400,9 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    await client.close()
+
+# See README.md for the production start command and multi-worker caching notes
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("server:app", loop="uvloop", http="httptools", workers=os.cpu_count())
@@ -0,0 +1,95 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# server.py reads these at import time; the real .env leaves JWT_SECRET_KEY empty
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, docs, before_iter=None):
+        self.docs = docs
+        self.before_iter = before_iter
+
+    def sort(self, *args):
+        return self
+
+    def skip(self, offset):
+        self.docs = self.docs[offset:]
+        return self
+
+    def limit(self, limit):
+        if limit:
+            self.docs = self.docs[:limit]
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        if self.before_iter:
+            await self.before_iter()
+        for doc in self.docs:
+            yield dict(doc)
+
+
+class FakeProducts:
+    """In-memory stand-in for db.products covering the calls server.py makes"""
+
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.find_one_calls = 0
+        self.before_iter = None
+        self.find_one_hook = None
+
+    def find(self, query, projection=None):
+        # Snapshot now, like a real cursor reading pre-write data
+        return FakeCursor([dict(doc) for doc in self.docs], self.before_iter)
+
+    async def find_one(self, query, projection=None):
+        self.find_one_calls += 1
+        snapshot = next((dict(doc) for doc in self.docs if doc["id"] == query["id"]), None)
+        if self.find_one_hook:
+            await self.find_one_hook()
+        return snapshot
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        for doc in self.docs:
+            if doc["id"] == query["id"]:
+                doc.update(update["$set"])
+                return dict(doc)
+        return None
+
+
+class FakeDB:
+    def __init__(self, products):
+        self.products = products
+
+
+@pytest.fixture
+def products(monkeypatch):
+    fake = FakeProducts()
+    monkeypatch.setattr(server, "db", FakeDB(fake))
+    return fake
+
+
+@pytest.fixture(autouse=True)
+def reset_server_state():
+    server._token_cache.clear()
+    server._products_cache.clear()
+    server._inflight_products.clear()
+    yield
+    server._token_cache.clear()
+    server._products_cache.clear()
+    server._inflight_products.clear()
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def test_concurrent_lookups_share_one_query(products):
+    products.docs = [{"id": "p1", "name": "Lamp"}]
+    release = asyncio.Event()
+
+    async def blocked():
+        await release.wait()
+
+    products.find_one_hook = blocked
+
+    async def run():
+        lookups = [asyncio.ensure_future(server.get_product("p1")) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*lookups)
+
+    results = asyncio.run(run())
+    assert products.find_one_calls == 1
+    assert results == [{"id": "p1", "name": "Lamp"}] * 5
+    assert server._inflight_products == {}
+
+
+def test_lookup_started_before_update_is_not_joined(products):
+    products.docs = [{"id": "p1", "name": "Lamp"}]
+    release = asyncio.Event()
+
+    async def first_call_blocks():
+        if products.find_one_calls == 1:
+            await release.wait()
+
+    products.find_one_hook = first_call_blocks
+
+    async def run():
+        before = asyncio.ensure_future(server.get_product("p1"))
+        while products.find_one_calls < 1:
+            await asyncio.sleep(0)
+        await server.update_product("p1", server.ProductUpdate(name="Desk lamp"))
+        after = asyncio.ensure_future(server.get_product("p1"))
+        await asyncio.sleep(0)
+        release.set()
+        return await before, await after
+
+    before, after = asyncio.run(run())
+    assert products.find_one_calls == 2
+    assert before["name"] == "Lamp"
+    assert after["name"] == "Desk lamp"
+    assert server._inflight_products == {}
+
+
+def test_failed_lookup_reaches_every_waiter_and_clears_entry(products):
+    release = asyncio.Event()
+
+    async def fails():
+        await release.wait()
+        raise RuntimeError("connection reset")
+
+    products.find_one_hook = fails
+
+    async def run():
+        lookups = [asyncio.ensure_future(server.get_product("p1")) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*lookups, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert products.find_one_calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert server._inflight_products == {}
+
+
+def test_missing_product_is_404(products):
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(server.get_product("missing"))
+    assert exc_info.value.status_code == 404
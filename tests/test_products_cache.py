@@ -0,0 +1,62 @@
+import asyncio
+
+import orjson
+import pytest
+from starlette.requests import Request
+
+import server
+
+
+def make_request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def list_products(if_none_match=None):
+    return asyncio.run(server.get_all_products(make_request(if_none_match), limit=100, offset=0))
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", W/"abc"', True),
+    ('"xyz" ,"abc"', True),
+    ("*", True),
+    ('"xyz"', False),
+    ('"ab"', False),
+    ("", False),
+    (None, False),
+])
+def test_etag_matches(header, expected):
+    assert server.etag_matches(header, '"abc"') is expected
+
+
+def test_matching_etag_returns_304(products):
+    products.docs = [{"id": "p1", "name": "Lamp"}]
+
+    first = list_products()
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert orjson.loads(first.body) == [{"id": "p1", "name": "Lamp"}]
+
+    assert list_products(etag).status_code == 304
+    assert list_products(f"W/{etag}").status_code == 304
+    assert list_products('"stale"').status_code == 200
+
+
+def test_write_during_read_does_not_recache_stale_list(products):
+    products.docs = [{"id": "p1", "name": "Lamp"}]
+
+    async def write_lands_mid_read():
+        products.docs = [{"id": "p1", "name": "Desk lamp"}]
+        server.invalidate_products_cache()
+
+    products.before_iter = write_lands_mid_read
+    stale = list_products()
+    assert orjson.loads(stale.body) == [{"id": "p1", "name": "Lamp"}]
+    assert len(server._products_cache) == 0
+
+    products.before_iter = None
+    fresh = list_products()
+    assert orjson.loads(fresh.body) == [{"id": "p1", "name": "Desk lamp"}]
+    assert fresh.headers["etag"] != stale.headers["etag"]
@@ -0,0 +1,68 @@
+import time
+from types import SimpleNamespace
+
+import jwt
+import pytest
+
+import server
+
+
+def make_token(sub="admin", expires_in=60):
+    return jwt.encode({"sub": sub, "exp": int(time.time()) + expires_in}, server.SECRET_KEY_BYTES, algorithm=server.ALGORITHM)
+
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    calls = []
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(server.jwt, "decode", counting_decode)
+    return calls
+
+
+def test_repeat_token_is_served_from_cache(decode_calls):
+    token = make_token()
+    assert server.decode_token(token)["sub"] == "admin"
+    assert server.decode_token(token)["sub"] == "admin"
+    assert len(decode_calls) == 1
+
+
+def test_cache_entry_is_bounded_by_token_exp(monkeypatch, decode_calls):
+    token = make_token(expires_in=2)
+    exp = jwt.decode(token, options={"verify_signature": False})["exp"]
+    decode_calls.clear()
+
+    server.decode_token(token)
+    _, expires_at = server._token_cache[token]
+    assert expires_at == exp
+
+    # Past exp the cached payload must not be returned, even within the cache TTL
+    monkeypatch.setattr(server, "time", SimpleNamespace(time=lambda: exp + 1))
+    server.decode_token(token)
+    assert len(decode_calls) == 2
+
+
+def test_expired_token_is_not_cached():
+    token = make_token(expires_in=-10)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        server.decode_token(token)
+    assert len(server._token_cache) == 0
+
+
+def test_invalid_token_is_not_cached():
+    token = jwt.encode({"sub": "admin", "exp": int(time.time()) + 60}, b"other-secret", algorithm=server.ALGORITHM)
+    with pytest.raises(jwt.InvalidSignatureError):
+        server.decode_token(token)
+    assert len(server._token_cache) == 0
+
+
+def test_cached_signature_does_not_validate_other_tokens():
+    token = make_token()
+    server.decode_token(token)
+    forged = "AAAA.BBBB." + token.rsplit(".", 1)[-1]
+    with pytest.raises(jwt.InvalidTokenError):
+        server.decode_token(forged)